@@ -1,16 +1,89 @@
 # config_manager.py
-import json
 import os
+import re
+import stat
 import logging
-from typing import Dict, List, Any, Optional
+import secrets
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
 from functools import lru_cache
 from pathlib import Path
 
-from dotenv import load_dotenv, find_dotenv
+from dotenv import load_dotenv
 from utils.session_manager import SessionManager
 
+# Prefer orjson (C parser, works on bytes); fall back to stdlib json.
+try:
+    import orjson
+
+    _JSONDecodeError = orjson.JSONDecodeError
+    _loads = orjson.loads
+
+    def _dump_pretty(data: Any) -> bytes:
+        return orjson.dumps(
+            data,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+        )
+
+    def _dump_compact(data: Any) -> bytes:
+        # Telegram entity IDs are ints; stdlib json stringifies such keys too
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+except ImportError:
+    import json
+
+    _JSONDecodeError = json.JSONDecodeError
+    _loads = json.loads
+
+    def _dump_pretty(data: Any) -> bytes:
+        try:
+            return json.dumps(data, indent=2, sort_keys=True).encode('utf-8')
+        except TypeError:
+            # Mixed int/str keys cannot be sorted by stdlib json
+            return json.dumps(data, indent=2).encode('utf-8')
+
+    def _dump_compact(data: Any) -> bytes:
+        return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+# Optional: pysimdjson lets single-device lookups touch only the keys they need.
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+# .env grammar: [export ]KEY=value, KEY='value' or KEY="value", optional
+# trailing comment. Quoted values may span lines; unquoted values cannot
+# start with a quote. A match stops before the line terminator (LF or CRLF).
+_ENV_LINE = re.compile(
+    r"""^[ \t]*(export[ \t]+)?([A-Za-z_]\w*)[ \t]*=[ \t]*"""
+    r"""(?:'([^']*)'|"((?:[^"\\]|\\.)*)"|(?![ \t]*['"])([^\r\n#]*?))"""
+    r"""[ \t]*(?:#[^\r\n]*)?(?=\r?\n|\r?\Z)""",
+    re.M,
+)
+
+# Escapes python-dotenv decodes inside double-quoted values
+_ENV_ESCAPES = str.maketrans({'\\': '\\\\', '"': '\\"', '\n': '\\n', '\r': '\\r'})
+
+
+def _quote_env_value(value: str) -> str:
+    """
+    Quote a .env value so python-dotenv reads it back unchanged.
+    
+    Single quotes are used unless the value contains an apostrophe, a
+    backslash or a line break; otherwise it is double-quoted with those
+    characters escaped, which dotenv unescapes on load. The result always
+    fits on one line.
+    """
+    if not any(c in value for c in "'\\\n\r"):
+        return f"'{value}'"
+    return f'"{value.translate(_ENV_ESCAPES)}"'
+
+
 class ConfigManager:
-    """Manages configuration files for the automation tool with optimized performance."""
+    """
+    Manages configuration files for the automation tool with optimized performance.
+    
+    Obtain instances through get_config_manager() to share one per config dir.
+    """
     
     def __init__(self, config_dir: str = "config"):
         self.config_dir = Path(config_dir)
@@ -23,89 +96,181 @@ class ConfigManager:
         self.example_env_file = self.config_dir.parent / ".env.example"
         self.sessions_dir = self.config_dir.parent / "sessions"
         
+        # Pre-computed string keys for the cache (avoids Path hashing on hot paths)
+        self.mobile_devices_path_s = str(self.mobile_devices_path)
+        self.telegram_entities_path_s = str(self.telegram_entities_path)
+        
         # Default environment settings (prevents redundant parsing)
         self.default_env_settings = {
             "TELEGRAM_API_ID": "",
             # ... (other settings)
         }
         
-        # Single-source cache for configuration files
-        self._config_cache = {}
+        # Cached result of get_env_settings
+        self._env_cache: Optional[Dict[str, str]] = None
+        
+        # Single-source LRU cache for configuration files: path -> (mtime_ns, data)
+        self._config_cache: "OrderedDict[str, Tuple[int, Any]]" = OrderedDict()
+        self._cache_cap = 32
+        
+        # Name -> device index, tied to the cache entry it was built from
+        self._device_index: Dict[str, Dict[str, Any]] = {}
+        self._device_index_for: Optional[Tuple[int, Any]] = None
+        
+        # Reusable simdjson parser for lazy device lookups (None if unavailable)
+        self._simd_parser = simdjson.Parser() if simdjson is not None else None
+        self._lazy_mtime_ns: Optional[int] = None
         
         # Lazy-loaded session manager
         self._session_manager = None
         
-        # Load environment variables (only once)
-        load_dotenv(find_dotenv(str(self.env_file_path), usecwd=True))
+        # Load environment variables from the known path (no upward directory search)
+        if self.env_file_path.is_file():
+            load_dotenv(self.env_file_path, override=False)
         
         # Ensure critical files exist
         self._initialize_config_files()
     
     def _check_config_dir(self) -> None:
-        """Ensure config directory exists with atomic mkdir."""
-        self.config_dir.mkdir(exist_ok=True, parents=True)
-        logging.info(f"Config directory confirmed: {self.config_dir}")
+        """Ensure config directory exists, skipping mkdir when it is already there."""
+        if not os.path.isdir(self.config_dir):
+            self.config_dir.mkdir(exist_ok=True, parents=True)
+        logging.debug("Config directory confirmed: %s", self.config_dir)
     
     def _initialize_config_files(self) -> None:
         """Create missing config files once during initialization."""
         if not self.example_env_file.exists():
             self._create_example_env()
-        if not self.mobile_devices_path.exists():
+        
+        # One scan of the (small) config dir covers both JSON files; a miss is
+        # confirmed with exists() since name matching is case-insensitive on
+        # some filesystems
+        with os.scandir(self.config_dir) as it:
+            cfg_names = {e.name for e in it}
+        if (self.mobile_devices_path.name not in cfg_names
+                and not self.mobile_devices_path.exists()):
             self._create_default_devices()
-        if not self.telegram_entities_path.exists():
+        if (self.telegram_entities_path.name not in cfg_names
+                and not self.telegram_entities_path.exists()):
             self._create_empty_telegram_entities()
     
     def _read_json_file(self, file_path: Path) -> Any:
         """Efficient JSON reading with cache."""
-        if file_path in self._config_cache:
-            return self._config_cache[file_path]
-        
+        key = os.fspath(file_path)
         try:
-            with file_path.open('r', encoding='utf-8') as f:
-                data = json.load(f)
-                self._config_cache[file_path] = data
-                return data
-        except (json.JSONDecodeError, FileNotFoundError):
+            # One stat call decides whether the cached copy is still current
+            mtime_ns = os.stat(key).st_mtime_ns
+            cached = self._config_cache.get(key)
+            if cached is not None and cached[0] == mtime_ns:
+                self._config_cache.move_to_end(key)
+                return cached[1]
+            
+            with open(key, 'rb') as f:
+                data = _loads(f.read())
+            self._cache_put(key, mtime_ns, data)
+            return data
+        except (_JSONDecodeError, FileNotFoundError):
+            self._config_cache.pop(key, None)
             # Return empty dict/list based on file type
-            return [] if file_path == self.mobile_devices_path else {}
+            return [] if key == self.mobile_devices_path_s else {}
+    
+    def _cache_put(self, key: str, mtime_ns: int, data: Any) -> None:
+        """Store an entry as most recently used, evicting the oldest beyond the cap."""
+        self._config_cache[key] = (mtime_ns, data)
+        self._config_cache.move_to_end(key)
+        while len(self._config_cache) > self._cache_cap:
+            self._config_cache.popitem(last=False)
     
-    def _write_json_file(self, file_path: Path, data: Any) -> bool:
-        """Atomic JSON writing with cache invalidation."""
+    def _write_json_file(
+        self, file_path: Path, data: Any, pretty: bool = True, durable: bool = False
+    ) -> bool:
+        """
+        Atomic JSON writing (temp file + os.replace) with cache update.
+        
+        Use pretty=False for machine-written files such as telegram_entities.json
+        to skip indentation and write fewer bytes.
+        """
+        # Existing files keep their permissions; new ones get 0o666 minus umask
         try:
-            with file_path.open('w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2)
-            self._config_cache[file_path] = data  # Update cache
+            mode = stat.S_IMODE(os.stat(file_path).st_mode)
+        except FileNotFoundError:
+            mode = None
+        
+        tmp_path = None
+        try:
+            # Unique temp name so concurrent writers never share a temp file
+            tmp_path = file_path.with_name(f"{file_path.name}.{secrets.token_hex(8)}.tmp")
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_dump_pretty(data) if pretty else _dump_compact(data))
+                if durable:
+                    f.flush()
+                    os.fsync(f.fileno())
+            if mode is not None:
+                os.chmod(tmp_path, mode)
+            os.replace(tmp_path, file_path)
+            # Update cache with the new mtime so the next read is a hit
+            key = os.fspath(file_path)
+            self._cache_put(key, os.stat(key).st_mtime_ns, data)
             return True
         except Exception as e:
             logging.error(f"Error writing to {file_path}: {e}")
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
             return False
     
     def get_env_settings(self) -> Dict[str, str]:
-        """Efficiently retrieve environment variables using os.getenv."""
-        env_vars = self.default_env_settings.copy()
-        for key in env_vars:
-            env_vars[key] = os.getenv(key, env_vars[key])
-        return env_vars
+        """Retrieve environment settings, cached until the next save or invalidation."""
+        if self._env_cache is None:
+            self._env_cache = {
+                k: os.environ.get(k, v) for k, v in self.default_env_settings.items()
+            }
+        # Callers may edit the result (e.g. settings forms); keep the cache private
+        return dict(self._env_cache)
+    
+    def invalidate_env_cache(self) -> None:
+        """Drop cached environment settings (e.g. after reloading the environment)."""
+        self._env_cache = None
     
     def save_env_settings(self, settings: Dict[str, str]) -> bool:
         """Batch update .env file to minimize I/O operations."""
         try:
-            # Read existing .env into a dict
-            env_data = {}
-            if self.env_file_path.exists():
-                with self.env_file_path.open('r') as f:
-                    for line in f:
-                        if '=' in line:
-                            k, v = line.strip().split('=', 1)
-                            env_data[k] = v.strip("'\"")
+            text = (
+                self.env_file_path.read_bytes().decode('utf-8')
+                if self.env_file_path.exists() else ''
+            )
+            newline = '\r\n' if '\r\n' in text else '\n'
+            updates = {**self.default_env_settings, **settings}
             
-            # Update with new values
-            env_data.update({**self.default_env_settings, **settings})
+            # Replace only the assignments being updated, in place; every other
+            # character (comments, blank lines, unrecognised syntax, untouched
+            # keys, line terminators) is carried through verbatim
+            parts = []
+            pos = 0
+            pending = dict(updates)
+            for m in _ENV_LINE.finditer(text):
+                key = m.group(2)
+                if key not in updates:
+                    continue
+                parts.append(text[pos:m.start()])
+                parts.append(f"{m.group(1) or ''}{key}={_quote_env_value(updates[key])}")
+                pos = m.end()
+                pending.pop(key, None)
+            parts.append(text[pos:])
+            
+            if pending:
+                if text and not text.endswith('\n'):
+                    parts.append(newline)
+                parts.extend(
+                    f"{k}={_quote_env_value(v)}{newline}" for k, v in sorted(pending.items())
+                )
             
             # Write back in one operation
-            with self.env_file_path.open('w') as f:
-                for key in sorted(env_data.keys()):
-                    f.write(f"{key}='{env_data[key]}'\n")
+            self.env_file_path.write_bytes(''.join(parts).encode('utf-8'))
+            self._env_cache = None
             return True
         except Exception as e:
             logging.error(f"Error writing to .env: {e}")
@@ -115,18 +280,82 @@ class ConfigManager:
         """Cached device list with O(1) access."""
         return self._read_json_file(self.mobile_devices_path)
     
-    def get_device_by_name(self, device_name: str) -> Optional[Dict[str, Any]]:
-        """O(1) device lookup using a pre-built index."""
+    def _find_device_lazy(self, device_name: str) -> Optional[Dict[str, Any]]:
+        """Scan the devices file with simdjson, materializing only the match."""
+        devices = self._simd_parser.parse(self.mobile_devices_path.read_bytes())
+        for device in devices:
+            if isinstance(device, simdjson.Object) and device.get('name') == device_name:
+                return device.as_dict()
+        return None
+    
+    def _get_device_index(self) -> Dict[str, Dict[str, Any]]:
+        """Name -> device index over the cached device list."""
         devices = self.get_mobile_devices()
-        if not hasattr(self, '_device_index'):
-            self._device_index = {d['name']: d for d in devices}
-        return self._device_index.get(device_name)
+        # Every cache store (reads and writes, even of a list mutated in place)
+        # creates a new (mtime_ns, data) entry, so rebuild whenever it changes
+        entry = self._config_cache.get(self.mobile_devices_path_s)
+        if entry is None or entry is not self._device_index_for:
+            self._device_index = {
+                d['name']: d for d in devices if isinstance(d, dict) and 'name' in d
+            }
+            self._device_index_for = entry
+        return self._device_index
+    
+    def get_device_by_name(self, device_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Return a copy of the named device, or None if it does not exist.
+        
+        Lookups go through a cached name index. When simdjson is available and
+        the cache is cold or stale, the first lookup for that file version scans
+        the file lazily instead of materializing the whole list.
+        """
+        if self._simd_parser is not None:
+            key = self.mobile_devices_path_s
+            try:
+                mtime_ns = os.stat(key).st_mtime_ns
+            except FileNotFoundError:
+                return None
+            cached = self._config_cache.get(key)
+            stale = cached is None or cached[0] != mtime_ns
+            if stale and self._lazy_mtime_ns != mtime_ns:
+                # Repeated lookups of the same version warm the cache instead
+                self._lazy_mtime_ns = mtime_ns
+                try:
+                    return self._find_device_lazy(device_name)
+                except (ValueError, OSError):
+                    pass
+        
+        device = self._get_device_index().get(device_name)
+        return dict(device) if device is not None else None
     
     def invalidate_cache(self, file_path: Optional[Path] = None) -> None:
-        """Invalidate cache for a specific file or all files."""
+        """
+        Invalidate cache for a specific file or all files.
+        
+        Reads already re-validate against the file mtime, so this is only
+        needed when a file is rewritten within the same mtime tick.
+        """
         if file_path is not None:
-            self._config_cache.pop(file_path, None)
+            self._config_cache.pop(os.fspath(file_path), None)
         else:
             self._config_cache.clear()
-            if hasattr(self, '_device_index'):
-                delattr(self, '_device_index')
\ No newline at end of file
+
+
+@lru_cache(maxsize=8)
+def _get_config_manager(config_dir: str) -> ConfigManager:
+    return ConfigManager(config_dir)
+
+
+def get_config_manager(config_dir: str = "config") -> ConfigManager:
+    """
+    Return a shared ConfigManager for config_dir, constructing it on first use.
+    
+    The directory is normalised to an absolute path, so every spelling of the
+    same directory maps to one instance. Prefer this over instantiating
+    ConfigManager directly; use get_config_manager.cache_clear() to force a
+    fresh instance (e.g. in tests).
+    """
+    return _get_config_manager(os.path.abspath(config_dir))
+
+
+get_config_manager.cache_clear = _get_config_manager.cache_clear
@@ -5,10 +5,42 @@ Provides components for integrating the LinkProcessor with the GUI.
 import tkinter as tk
 from tkinter import scrolledtext
 import re
-from typing import Callable, List, Optional, Any
+from bisect import bisect_left, bisect_right
+from typing import Callable, List, Optional, Any, Tuple
 
 from utils.link_processor import LinkProcessor, create_link_processor
 
+# Issue tag commands straight to the Tcl interpreter, bypassing the Tkinter
+# wrapper methods. This relies on Tk's "pathName tag ..." command syntax;
+# set to False to use the stock Text.tag_* methods instead.
+FAST_TK = True
+
+
+# Characters outside the BMP (e.g. emoji); Tcl 8.6 counts each as two chars
+_ASTRAL_CHAR = re.compile("[\U00010000-\U0010FFFF]")
+
+
+def _offsets_to_indices(
+    offsets: List[int], newlines: List[int], astral: List[int],
+    astral_width: int, out: List[str],
+) -> None:
+    """
+    Append the Tk "line.col" index of each character offset to out.
+    
+    newlines and astral are the sorted positions of newline and non-BMP
+    characters in the text; each non-BMP character occupies astral_width
+    Tk chars. Each lookup is a binary search over these prefix tables.
+    """
+    for offset in offsets:
+        line = bisect_left(newlines, offset)
+        line_start = newlines[line - 1] + 1 if line else 0
+        col = offset - line_start
+        if astral:
+            col += (astral_width - 1) * (
+                bisect_left(astral, offset) - bisect_left(astral, line_start)
+            )
+        out.append(f"{line + 1}.{col}")
+
 class InstagramLinkMenu:
     """
     Adds context menu functionality to text widgets for handling Instagram links.
@@ -21,9 +53,31 @@ class InstagramLinkMenu:
     
     def __init__(self, text_widget: scrolledtext.ScrolledText, link_processor: LinkProcessor):
         self.text_widget = text_widget
+        self._tk = text_widget.tk
+        self._widget_name = str(text_widget)
+        # Tk chars per non-BMP character: 2 on Tcl 8.6 (UTF-16), 1 on Tcl 9
+        self._astral_width = int(self._tk.call('string', 'length', '\U0001F600'))
         self.link_processor = link_processor
+        
+        # The URL pattern must be precompiled so highlight_links never recompiles it
+        assert isinstance(link_processor.INSTAGRAM_URL_PATTERN, re.Pattern)
+        self._url_pattern = link_processor.INSTAGRAM_URL_PATTERN
+        
         self.context_menu = tk.Menu(text_widget, tearoff=0)
         
+        # (start_offset, end_offset, link_text) of highlighted links in Tk chars,
+        # sorted by start. Valid while the widget's modified flag stays clear:
+        # highlight_links clears it and any insert or delete sets it again.
+        self._link_spans: List[Tuple[int, int, str]] = []
+        self._link_starts: List[int] = []
+        self._spans_valid = False
+        
+        # Scratch lists reused (cleared) by every highlight_links call
+        self._newlines: List[int] = []
+        self._astral: List[int] = []
+        self._offsets: List[int] = []
+        self._ranges: List[str] = []
+        
         # Bind right-click event (Button-3)
         self.text_widget.bind("<Button-3>", self._show_context_menu)
         
@@ -32,16 +86,26 @@ class InstagramLinkMenu:
     
     def _show_context_menu(self, event: tk.Event) -> None:
         """Show context menu if cursor is over an Instagram link."""
-        index = self.text_widget.index(f"@{event.x},{event.y}")
         self.selected_link = None
         
-        # Check if cursor is over a tagged link
-        if self.text_widget.tag_names(index) == ("instagram_link",):
-            # Extract link text under cursor
-            start, end = self.text_widget.tag_prevrange("instagram_link", index)
-            if start and end:
-                self.selected_link = self.text_widget.get(start, end)
-                self.context_menu.post(event.x_root, event.y_root)
+        if self._spans_valid and not self.text_widget.edit_modified():
+            # Text unchanged since highlight_links: use the cached spans.
+            # Character offset under the cursor (count returns None for zero)
+            count = self.text_widget.count("1.0", f"@{event.x},{event.y}", "chars")
+            offset = count[0] if count else 0
+            i = bisect_right(self._link_starts, offset) - 1
+            if i >= 0 and offset < self._link_spans[i][1]:
+                self.selected_link = self._link_spans[i][2]
+        else:
+            # Text was edited since highlighting; follow the live tag ranges
+            index = self.text_widget.index(f"@{event.x},{event.y}")
+            if "instagram_link" in self.text_widget.tag_names(index):
+                link_range = self.text_widget.tag_prevrange("instagram_link", f"{index}+1c")
+                if link_range:
+                    self.selected_link = self.text_widget.get(*link_range)
+        
+        if self.selected_link:
+            self.context_menu.post(event.x_root, event.y_root)
     
     def _open_selected_link(self) -> None:
         """Open selected Instagram link in browser."""
@@ -59,15 +123,59 @@ class InstagramLinkMenu:
         self.context_menu.unpost()
     
     def highlight_links(self, text_content: str) -> None:
-        """Highlight Instagram links in the text widget efficiently."""
+        """
+        Highlight Instagram links in the text widget efficiently.
+        
+        Clears the widget's modified flag, which the context menu uses to tell
+        whether the cached link spans still match the text.
+        """
         # Clear existing highlights
-        self.text_widget.tag_remove("instagram_link", "1.0", tk.END)
+        if FAST_TK:
+            self._tk.call(self._widget_name, 'tag', 'remove', 'instagram_link', '1.0', 'end')
+        else:
+            self.text_widget.tag_remove("instagram_link", "1.0", tk.END)
+        
+        # Scan the text once for newlines and (where Tk widens them) non-BMP chars
+        newlines = self._newlines
+        astral = self._astral
+        newlines.clear()
+        astral.clear()
+        newlines.extend(m.start() for m in re.finditer("\n", text_content))
+        if self._astral_width != 1:
+            astral.extend(m.start() for m in _ASTRAL_CHAR.finditer(text_content))
+        extra = self._astral_width - 1
+        
+        # Collect link offsets for tagging and cache their spans (in Tk chars)
+        # so the context menu can resolve links without Tk queries
+        offsets = self._offsets
+        spans = self._link_spans
+        starts = self._link_starts
+        offsets.clear()
+        spans.clear()
+        starts.clear()
+        for match in self._url_pattern.finditer(text_content):
+            start, end = match.span()
+            offsets.append(start)
+            offsets.append(end)
+            if astral:
+                start += extra * bisect_left(astral, start)
+                end += extra * bisect_left(astral, end)
+            spans.append((start, end, match.group()))
+            starts.append(start)
+        
+        self._ranges.clear()
+        _offsets_to_indices(offsets, newlines, astral, self._astral_width, self._ranges)
+        
+        # Tag every range with a single Tk call
+        if self._ranges:
+            if FAST_TK:
+                self._tk.call(self._widget_name, 'tag', 'add', 'instagram_link', *self._ranges)
+            else:
+                self.text_widget.tag_add("instagram_link", *self._ranges)
         
-        # Find all Instagram links
-        for match in self.link_processor.INSTAGRAM_URL_PATTERN.finditer(text_content):
-            start_idx = f"{match.start()//85}.{match.start()%85}"  # Example index calculation (simplified)
-            end_idx = f"{match.end()//85}.{match.end()%85}"
-            self.text_widget.tag_add("instagram_link", start_idx, end_idx)
+        # Start tracking edits from here (tagging does not set the flag)
+        self.text_widget.edit_modified(False)
+        self._spans_valid = True
 
 def enhance_text_widget(text_widget: scrolledtext.ScrolledText, parent_window: Optional[tk.Tk] = None) -> InstagramLinkMenu:
     """